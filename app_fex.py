@@ -1,11 +1,32 @@
 import gradio as gr
 import os
 import zipfile
+import zlib
+import errno
+import stat
 import shutil
 import tempfile
+import threading
+import time
 from pathlib import Path
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-import math
+import numpy as np
+
+# Optional: libdeflate bindings (`pip install deflate`) compress and CRC
+# noticeably faster than the stdlib zlib. Fall back to zlib if missing.
+try:
+    import deflate
+except ImportError:
+    deflate = None
+
+if deflate is not None:
+    # zipfile computes CRC-32 through its module-level crc32 (zlib's software
+    # implementation). libdeflate's is a drop-in replacement that uses
+    # carry-less multiply (PCLMULQDQ/VPCLMULQDQ) where the CPU supports it,
+    # which speeds up large files streamed through ZipFile.write.
+    zipfile.crc32 = deflate.crc32
 
 # --- Configuration ---
 # Set the root directory the explorer is allowed to access.
@@ -13,20 +34,43 @@ import math
 # Use "/" for the entire filesystem (use with caution).
 ROOT_DIR = "/" #os.path.abspath(os.path.expanduser("~"))
 
+# DEFLATE level used for ZIP downloads (same as zlib's default).
+ZIP_COMPRESS_LEVEL = 6
+# Files up to this size are read into memory and compressed on a worker
+# thread; larger files are streamed through zipfile on the main thread.
+ZIP_PARALLEL_MAX_FILE_SIZE = 16 * 1024 * 1024
+# Upper bound on compression threads. os.cpu_count() reports the host's cores,
+# not a container's CPU limit, so it is capped.
+ZIP_MAX_WORKERS = 8
+# Budget for file data buffered by in-flight compression tasks. Compressed
+# copies add at most about as much again, so peak memory stays near twice this.
+ZIP_MAX_BUFFERED_BYTES = 128 * 1024 * 1024
+# ZIP downloads are written straight into Gradio's file cache (the same
+# location Gradio itself uses), so Gradio can serve them without first
+# hashing and copying the whole archive into its cache.
+ZIP_OUTPUT_DIR = os.environ.get("GRADIO_TEMP_DIR") or os.path.join(tempfile.gettempdir(), "gradio")
+# Maximum number of uploaded files moved into place concurrently.
+UPLOAD_MAX_WORKERS = 16
+# Number of directory listings kept in the build_file_list cache.
+FILE_LIST_CACHE_SIZE = 128
+
 # --- State Management ---
 # Using a class to manage state more cleanly than global variables.
 class FileExplorerState:
     def __init__(self, root_dir):
-        self.root_dir = root_dir
-        self.current_path = root_dir
+        self.root_dir = os.path.abspath(root_dir)
+        # Precomputed once so the security check is a plain string compare.
+        self._root_prefix = self.root_dir.rstrip(os.sep) + os.sep
+        self.current_path = self.root_dir
 
     def set_path(self, new_path):
         """Safely sets the current path, ensuring it's within the root directory."""
-        # Normalize and resolve the path
-        abs_path = os.path.abspath(os.path.join(self.current_path, new_path))
+        # Normalize and resolve the path. current_path is always absolute, so
+        # normpath is enough (abspath would also call os.getcwd()).
+        abs_path = os.path.normpath(os.path.join(self.current_path, new_path))
         
         # Security check: Prevent escaping the root directory
-        if os.path.commonpath([self.root_dir, abs_path]) != self.root_dir:
+        if not self.is_within_root(abs_path):
             print(f"Warning: Access denied. Attempted to access path outside of root: {abs_path}")
             return self.current_path # Return old path
             
@@ -34,6 +78,10 @@ class FileExplorerState:
             self.current_path = abs_path
         return self.current_path
 
+    def is_within_root(self, abs_path):
+        """True if the absolute, normalized abs_path is the root directory or lies below it."""
+        return abs_path == self.root_dir or abs_path.startswith(self._root_prefix)
+
     def go_up(self):
         """Navigates to the parent directory."""
         parent = os.path.dirname(self.current_path)
@@ -48,84 +96,314 @@ class FileExplorerState:
 state = FileExplorerState(ROOT_DIR)
 
 # --- Helper Functions ---
-def format_size(size_bytes):
-    """Formats size in bytes to a human-readable string."""
-    if size_bytes == 0:
-        return "0 B"
-    size_name = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
-    i = int(math.floor(math.log(size_bytes, 1024)))
-    p = math.pow(1024, i)
-    s = round(size_bytes / p, 2)
-    return f"{s} {size_name[i]}"
+SIZE_NAMES = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+
+# Powers of 1024 for the units that fit in an int64 (B .. EB), and the unit
+# names as an array so they can be gathered by index in one step.
+SIZE_DIVISORS = np.array([1 << (10 * i) for i in range(7)], dtype=np.int64)
+SIZE_UNITS = np.array(SIZE_NAMES[:len(SIZE_DIVISORS)], dtype=object)
+
+def format_sizes(size_list):
+    """
+    Formats a list of sizes in bytes to human-readable strings in one NumPy pass.
+    """
+    if not size_list:
+        return []
+    sizes = np.array(size_list, dtype=np.int64)
+    # Unit index is the number of divisors <= size (0 for empty files)
+    idx = np.maximum(np.searchsorted(SIZE_DIVISORS, sizes, side="right") - 1, 0)
+    values = (sizes / SIZE_DIVISORS[idx]).tolist()
+    units = SIZE_UNITS[idx].tolist()
+    return [f"{round(v, 2)} {u}" if v > 0 else "0 B" for v, u in zip(values, units)]
+
+def compress_file_for_zip(file_path, size):
+    """
+    Reads a file and compresses it to a raw DEFLATE stream.
+    size is the file's size from the stat taken when it was enumerated.
+    Returns (data, crc, file_size), or None if the file is too large to buffer.
+    Uses libdeflate when installed, otherwise zlib; both release the GIL
+    while compressing, so this runs well on a thread pool.
+    """
+    if size > ZIP_PARALLEL_MAX_FILE_SIZE:
+        return None
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    if deflate is not None:
+        return deflate.deflate_compress(raw, ZIP_COMPRESS_LEVEL), deflate.crc32(raw), len(raw)
+    compressor = zlib.compressobj(ZIP_COMPRESS_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(raw) + compressor.flush()
+    return data, zlib.crc32(raw), len(raw)
+
+def write_precompressed(zipf, arcname, st, data, crc, file_size):
+    """
+    Appends an already DEFLATE-compressed entry to an open ZipFile,
+    filling in the header fields zipfile would normally compute itself.
+    st is the file's stat result, reused instead of ZipInfo.from_file's own stat.
+    """
+    zinfo = zipfile.ZipInfo(arcname, time.localtime(st.st_mtime)[:6])
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(data)
+
+    zipf.fp.seek(zipf.start_dir)
+    zinfo.header_offset = zipf.fp.tell()
+    zipf._writecheck(zinfo)
+    zipf._didModify = True
+    zipf.fp.write(zinfo.FileHeader())
+    zipf.fp.write(data)
+    zipf.start_dir = zipf.fp.tell()
+
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+
+def move_uploaded_file(temp_file_path, current_path):
+    """
+    Moves an uploaded temp file into current_path, keeping its filename.
+    Tries a plain rename first; when the temp dir lives on another filesystem
+    it copies the data (no metadata, which uploads don't need) and unlinks.
+    """
+    destination = os.path.join(current_path, os.path.basename(temp_file_path))
+    try:
+        os.rename(temp_file_path, destination)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # shutil.copyfile uses os.sendfile on Linux, so the bytes are copied
+        # in the kernel without passing through userspace.
+        shutil.copyfile(temp_file_path, destination)
+        os.unlink(temp_file_path)
+    return destination
+
+def move_uploaded_files_in_order(temp_file_paths, current_path):
+    """
+    Moves uploads that share a filename one after another, so they never write
+    the same destination concurrently and the last one wins, as a plain loop would.
+    Returns (saved_count, errors).
+    """
+    saved_count = 0
+    errors = []
+    for temp_file_path in temp_file_paths:
+        try:
+            move_uploaded_file(temp_file_path, current_path)
+            saved_count += 1
+        except Exception as e:
+            filename = os.path.basename(temp_file_path)
+            print(f"Upload error for {filename}: {e}")
+            errors.append(f"{filename}: {e}")
+    return saved_count, errors
+
+def iter_dir_files(top, arc_top):
+    """
+    Yields (file_path, arcname, stat_result) for every file below top, where
+    arcnames are rooted at arc_top. A scandir-based replacement for os.walk that
+    builds each name by string concatenation instead of os.path.join/relpath.
+    Like os.walk, symlinked directories are not followed and unreadable
+    directories are skipped; so are files that cannot be stat'ed (e.g. broken links).
+    """
+    stack = [(top, arc_top)]
+    while stack:
+        dir_path, arc_dir = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    arcname = arc_dir + "/" + entry.name
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        try:
+                            st = entry.stat()
+                        except OSError as e:
+                            print(f"Skipping unreadable path {entry.path}: {e}")
+                            continue
+                        yield entry.path, arcname, st
+                    elif not entry.is_symlink():
+                        subdirs.append((entry.path, arcname))
+        except OSError as e:
+            print(f"Error reading path {dir_path}: {e}")
+            continue
+        # Reversed so subdirectories are visited in listing order, top-down.
+        stack.extend(reversed(subdirs))
 
 # --- Core Functions ---
 
+# LRU cache of directory listings: path -> (st_mtime_ns, listing).
+# A directory's mtime changes whenever entries are added, removed or renamed,
+# so external changes invalidate the cached listing automatically.
+_file_list_cache = OrderedDict()
+_file_list_cache_lock = threading.Lock()
+
 def build_file_list(path):
     """
-    Builds a list of dictionaries for the contents of a given path.
+    Returns parallel lists (names, types, sizes) for the contents of a given path,
+    reusing the cached listing while the directory's mtime is unchanged.
     """
-    items_list = []
     try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError as e:
+        print(f"Error reading path {path}: {e}")
+        return [], [], []
+
+    with _file_list_cache_lock:
+        cached = _file_list_cache.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            _file_list_cache.move_to_end(path)
+            return cached[1]
+
+    listing = scan_file_list(path)
+    with _file_list_cache_lock:
+        _file_list_cache[path] = (mtime_ns, listing)
+        _file_list_cache.move_to_end(path)
+        if len(_file_list_cache) > FILE_LIST_CACHE_SIZE:
+            _file_list_cache.popitem(last=False)
+    return listing
+
+def invalidate_file_list(path):
+    """Drops the cached listing for path, e.g. after the explorer modified it."""
+    with _file_list_cache_lock:
+        _file_list_cache.pop(path, None)
+
+def scan_file_list(path):
+    """
+    Builds parallel lists (names, types, sizes) for the contents of a given path.
+    The listing is shallow: only the direct children of path are scanned.
+    """
+    names, types, sizes = [], [], []
+    try:
+        # A single scandir pass: DirEntry caches the file type, so each
+        # entry costs at most one stat (for the size of non-directories).
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    size = None
+                    if not is_dir:
+                        try:
+                            # Follow symlinks so linked files show the target's size
+                            size = entry.stat().st_size
+                        except FileNotFoundError:
+                            # Broken symlink: fall back to the link itself
+                            size = entry.stat(follow_symlinks=False).st_size
+                except OSError as e:
+                    print(f"Error reading entry {entry.path}: {e}")
+                    continue
+                # Decorate with the sort key (is_file, lowercased name) so it is
+                # computed once per entry and list.sort compares plain tuples.
+                name = entry.name
+                entries.append((not is_dir, name.lower(), name, size))
+
         # Sort items, directories first, then files, all case-insensitively
-        items = os.listdir(path)
-        items.sort(key=lambda x: (os.path.isfile(os.path.join(path, x)), x.lower()))
-        for item in items:
-            item_path = os.path.join(path, item)
-            is_dir = os.path.isdir(item_path)
-            size = format_size(os.path.getsize(item_path)) if not is_dir else "-"
-            items_list.append({
-                "name": item,
-                "type": "📁" if is_dir else "📄",
-                "size": size
-            })
+        entries.sort()
+        for is_file, _, name, _ in entries:
+            names.append(name)
+            types.append("📄" if is_file else "📁")
+        # Format all file sizes in a single vectorized pass
+        file_sizes = iter(format_sizes([size for is_file, _, _, size in entries if is_file]))
+        sizes = [next(file_sizes) if is_file else "-" for is_file, _, _, _ in entries]
     except (IOError, OSError, PermissionError) as e:
         print(f"Error reading path {path}: {e}")
-    return items_list
+    return names, types, sizes
+
+def get_selected_names(df):
+    """
+    Returns the names of the rows ticked in the DataFrame's 'Select' column.
+    """
+    if df is None or df.empty:
+        return []
+    select = df['Select']
+    # The column may arrive as booleans or as 'true'/'false' strings.
+    if pd.api.types.is_bool_dtype(select):
+        mask = select.to_numpy(dtype=bool)
+    else:
+        mask = select.astype(str).str.lower().eq('true').to_numpy()
+    return df['Name'].to_numpy()[mask].tolist()
 
 def create_zip_and_get_link(df, current_path, progress=gr.Progress()):
     """
     Creates a zip file from the selected checkboxes in the DataFrame.
     """
-    # --- NEW LOGIC: Extract paths directly from the DataFrame ---
-    selected_paths = []
-    if df is not None and not df.empty:
-        for index, row in df.iterrows():
-            # Check column 'Select' (case insensitive string or boolean check)
-            if str(row['Select']).lower() == 'true':
-                selected_paths.append(os.path.join(current_path, row['Name']))
-    # -----------------------------------------------------------
+    selected_paths = [os.path.join(current_path, name) for name in get_selected_names(df)]
 
     if not selected_paths:
         gr.Warning("No files or folders selected for download.")
         return None
 
-    temp_dir = tempfile.mkdtemp()
+    os.makedirs(ZIP_OUTPUT_DIR, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=ZIP_OUTPUT_DIR)
     zip_path = os.path.join(temp_dir, "download.zip")
     
     progress(0, desc="Starting zip process...")
     
     try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            total_items = len(selected_paths)
-            for i, path_str in enumerate(selected_paths):
-                full_path = os.path.abspath(path_str)
-                # Security check
-                if os.path.commonpath([state.root_dir, full_path]) != state.root_dir:
-                    print(f"Skipping unauthorized path: {full_path}")
-                    continue
-                
-                progress((i) / total_items, desc=f"Zipping: {os.path.basename(full_path)}")
-
-                if os.path.isdir(full_path):
-                    for root, _, files in os.walk(full_path):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            arcname = os.path.relpath(file_path, current_path)
-                            zipf.write(file_path, arcname)
-                elif os.path.isfile(full_path):
-                    arcname = os.path.relpath(full_path, current_path)
-                    zipf.write(full_path, arcname)
-        
+        # Enumerate every (file_path, arcname) pair up-front so the
+        # compression work can be spread over a thread pool.
+        zip_entries = []
+        # Arcnames are relative to current_path; normalize it once so they can
+        # be taken by slicing instead of calling os.path.relpath per item.
+        base = os.path.join(os.path.abspath(current_path), "")
+        base_len = len(base)
+        for path_str in selected_paths:
+            full_path = os.path.abspath(path_str)
+            # Security check
+            if not state.is_within_root(full_path):
+                print(f"Skipping unauthorized path: {full_path}")
+                continue
+
+            if full_path.startswith(base):
+                arcname = full_path[base_len:]
+            else:
+                arcname = os.path.relpath(full_path, current_path)
+
+            # One stat decides the branch and is kept for the zip entry;
+            # only directories are walked recursively.
+            try:
+                st = os.stat(full_path)
+            except OSError as e:
+                print(f"Skipping unreadable path {full_path}: {e}")
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                zip_entries.extend(iter_dir_files(full_path, arcname))
+            elif stat.S_ISREG(st.st_mode):
+                zip_entries.append((full_path, arcname, st))
+
+        workers = min(os.cpu_count() or 1, ZIP_MAX_WORKERS)
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESS_LEVEL) as zipf, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            total_files = len(zip_entries)
+            # Keep a bounded window of files in flight: at most 2 per worker and
+            # ZIP_MAX_BUFFERED_BYTES of file data, however large the selection is.
+            max_pending = 2 * workers
+            pending = deque()
+            pending_bytes = 0
+            entries = iter(zip_entries)
+            next_entry = next(entries, None)
+
+            for i in range(total_files):
+                while next_entry is not None and len(pending) < max_pending:
+                    file_path, _, st = next_entry
+                    # Files too large to buffer are streamed, not held in memory
+                    buffered = st.st_size if st.st_size <= ZIP_PARALLEL_MAX_FILE_SIZE else 0
+                    if pending and pending_bytes + buffered > ZIP_MAX_BUFFERED_BYTES:
+                        break
+                    future = executor.submit(compress_file_for_zip, file_path, st.st_size)
+                    pending.append((next_entry, buffered, future))
+                    pending_bytes += buffered
+                    next_entry = next(entries, None)
+
+                (file_path, arcname, st), buffered, future = pending.popleft()
+                progress(i / total_files, desc=f"Zipping: {arcname}")
+                result = future.result()
+                pending_bytes -= buffered
+                if result is None:
+                    zipf.write(file_path, arcname)
+                else:
+                    write_precompressed(zipf, arcname, st, *result)
+
         progress(1, desc="Zip creation complete!")
         gr.Info(f"Successfully zipped {len(selected_paths)} items.")
         return zip_path
@@ -142,31 +420,38 @@ def upload_files(file_paths, current_path):
         gr.Warning("No files selected to upload.")
         return update_file_display(current_path) + (None,) # Keep current state
 
+    # Gradio stores each upload as <cache>/<hash>/<original name>, so several
+    # uploads can share a filename. Group them by name (in upload order) so
+    # only distinct destinations are moved concurrently.
+    by_name = {}
+    for temp_file_path in file_paths:
+        by_name.setdefault(os.path.basename(temp_file_path), []).append(temp_file_path)
+
     saved_count = 0
-    try:
-        for temp_file_path in file_paths:
-            # Get the original filename
-            filename = os.path.basename(temp_file_path)
-            destination = os.path.join(current_path, filename)
-            
-            # Copy/Move the file
-            shutil.move(temp_file_path, destination)
-            saved_count += 1
-            
+    errors = []
+    # Cross-filesystem moves are a full copy, so overlap them on a thread pool.
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_MAX_WORKERS, len(by_name))) as executor:
+        futures = [executor.submit(move_uploaded_files_in_order, paths, current_path) for paths in by_name.values()]
+        for future in as_completed(futures):
+            group_saved, group_errors = future.result()
+            saved_count += group_saved
+            errors.extend(group_errors)
+
+    if errors:
+        gr.Warning(f"Uploaded {saved_count} files. Failed to upload {len(errors)}: {'; '.join(errors)}")
+    else:
         gr.Info(f"Successfully uploaded {saved_count} files.")
-    except Exception as e:
-        gr.Error(f"Error uploading files: {e}")
-        print(f"Upload error: {e}")
 
     # Return the updated file list (unpack the tuple from update_file_display)
     # Plus 'None' to clear the file uploader component
+    invalidate_file_list(current_path)
     return update_file_display(current_path) + (None,)
     
 # --- Gradio Interface ---
 with gr.Blocks() as demo:
-    
-    # Hidden state to store the list of selected file paths as a string
-    selected_paths_state = gr.Textbox(value="", visible=False)
+
+    # Per-session (path, listing) last pushed to the DataFrame, to skip identical re-renders
+    rendered_listing_state = gr.State(None)
 
     gr.Markdown("# 🌳 File Explorer")
     gr.Markdown("Browse the file system, select items, and download them as a ZIP file.")
@@ -217,39 +502,43 @@ with gr.Blocks() as demo:
 
     # --- Event Handling & Logic ---
 
-    def update_file_display(path):
-        """Updates the DataFrame with the contents of the new path."""
-        file_list = build_file_list(path)
-        # Create a pandas DataFrame to populate the component
-        df = pd.DataFrame([[False, item['type'], item['name'], item['size']] for item in file_list], columns=["Select", "Type", "Name", "Size"])
+    def update_file_display(path, last_rendered=None, current_display="None"):
+        """
+        Updates the DataFrame with the contents of the new path.
+        If this session's table already shows the same listing (last_rendered)
+        with nothing ticked, the table is left as-is with gr.skip() so Gradio
+        doesn't re-send it; the other outputs are still reset.
+        """
+        listing = build_file_list(path)
+        rendered = (path, listing)
+        if rendered == last_rendered and current_display == "None":
+            return path, gr.skip(), "None", False, gr.skip()
+
+        names, types, sizes = listing
+        # Create a pandas DataFrame column-by-column to populate the component.
+        # Explicit dtypes skip pandas' type inference, and copy=False keeps
+        # the column arrays as built instead of consolidating them.
+        df = pd.DataFrame({
+            "Select": np.zeros(len(names), dtype=bool),
+            "Type": pd.array(types, dtype="string"),
+            "Name": pd.array(names, dtype="string"),
+            "Size": pd.array(sizes, dtype="string"),
+        }, copy=False)
         # Reset selections on path change
-        return path, df, "None", "", False # Reset confirm delete checkbox
+        return path, df, "None", False, rendered # Reset confirm delete checkbox
 
-    def handle_selection_change(df: pd.DataFrame, current_path: str):
+    def handle_selection_change(df: pd.DataFrame):
         """
         Processes changes in the DataFrame (checkboxes) to update the selected list.
         """
-        selected_items = []
-        # Use a more robust check for the boolean value from the DataFrame,
-        # as it might be passed as a string 'true'/'false'.
-        for index, row in df.iterrows():
-            # Check the value in the 'Select' column
-            if str(row['Select']).lower() == 'true':
-                item_name = row['Name']
-                item_path = os.path.join(current_path, item_name)
-                selected_items.append(item_path)
-        
-        selected_paths_str = ",".join(selected_items)
+        names = get_selected_names(df)
         # Use a Markdown list for better formatting
-        if selected_items:
+        if names:
             # Create a multi-line string with a dash for each item
-            display_str = "\n".join([f"- {os.path.basename(p)}" for p in selected_items])
-        else:
-            display_str = "None"
-        
-        return selected_paths_str, display_str
+            return "\n".join("- " + name for name in names)
+        return "None"
 
-    def handle_row_select(evt: gr.SelectData, df_data: pd.DataFrame, current_path: str, current_display: str, current_selected: str, confirm_del: bool):
+    def handle_row_select(evt: gr.SelectData, df_data: pd.DataFrame, current_path: str, current_display: str, confirm_del: bool):
         """
         Handles clicking on a row to navigate into directories.
         """
@@ -277,13 +566,7 @@ with gr.Blocks() as demo:
             gr.Warning("Deletion not confirmed. Please check the confirmation box.")
             return update_file_display(current_path)
 
-        # --- NEW LOGIC: Extract paths directly from the DataFrame ---
-        selected_paths = []
-        if df is not None and not df.empty:
-            for index, row in df.iterrows():
-                if str(row['Select']).lower() == 'true':
-                    selected_paths.append(os.path.join(current_path, row['Name']))
-        # -----------------------------------------------------------
+        selected_paths = [os.path.join(current_path, name) for name in get_selected_names(df)]
 
         if not selected_paths:
             gr.Warning("No items selected to delete.")
@@ -294,16 +577,17 @@ with gr.Blocks() as demo:
         for path_str in selected_paths:
             full_path = os.path.abspath(path_str)
             # Security check
-            if os.path.commonpath([state.root_dir, full_path]) != state.root_dir:
+            if not state.is_within_root(full_path):
                 print(f"Skipping unauthorized delete path: {full_path}")
                 error_count += 1
                 continue
             
             try:
-                if os.path.isfile(full_path):
+                mode = os.stat(full_path).st_mode
+                if stat.S_ISREG(mode):
                     os.remove(full_path)
                     deleted_count += 1
-                elif os.path.isdir(full_path):
+                elif stat.S_ISDIR(mode):
                     shutil.rmtree(full_path)
                     deleted_count += 1
             except Exception as e:
@@ -313,43 +597,49 @@ with gr.Blocks() as demo:
         gr.Info(f"Deleted {deleted_count} items. Failed to delete {error_count} items.")
         
         # Refresh the file list
+        invalidate_file_list(current_path)
         return update_file_display(current_path)
 
     # --- Component Triggers ---
     
-    def handle_path_update(new_path):
+    def handle_path_update(new_path, last_rendered, current_display):
         state.set_path(new_path)
-        return update_file_display(state.current_path)
+        return update_file_display(state.current_path, last_rendered, current_display)
 
-    def handle_go_up():
+    def handle_go_up(last_rendered, current_display):
         state.go_up()
-        return update_file_display(state.current_path)
+        return update_file_display(state.current_path, last_rendered, current_display)
 
-    def handle_refresh(current_path):
-        return update_file_display(current_path)
+    def handle_refresh(current_path, last_rendered, current_display):
+        # File sizes can change without touching the directory's mtime,
+        # so an explicit refresh always rescans.
+        invalidate_file_list(current_path)
+        return update_file_display(current_path, last_rendered, current_display)
 
     demo.load(
         fn=update_file_display,
         inputs=[path_input],
-        outputs=[path_input, file_list_df, selected_display, selected_paths_state, confirm_delete_checkbox]
+        outputs=[path_input, file_list_df, selected_display, confirm_delete_checkbox, rendered_listing_state]
     )
 
-    path_input.submit(handle_path_update, inputs=[path_input], outputs=[path_input, file_list_df, selected_display, selected_paths_state, confirm_delete_checkbox])
-    up_button.click(handle_go_up, inputs=[], outputs=[path_input, file_list_df, selected_display, selected_paths_state, confirm_delete_checkbox])
-    refresh_button.click(handle_refresh, inputs=[path_input], outputs=[path_input, file_list_df, selected_display, selected_paths_state, confirm_delete_checkbox])
+    path_input.submit(handle_path_update, inputs=[path_input, rendered_listing_state, selected_display], outputs=[path_input, file_list_df, selected_display, confirm_delete_checkbox, rendered_listing_state])
+    up_button.click(handle_go_up, inputs=[rendered_listing_state, selected_display], outputs=[path_input, file_list_df, selected_display, confirm_delete_checkbox, rendered_listing_state])
+    refresh_button.click(handle_refresh, inputs=[path_input, rendered_listing_state, selected_display], outputs=[path_input, file_list_df, selected_display, confirm_delete_checkbox, rendered_listing_state])
 
-    file_list_df.change(
+    # .input fires only on user edits (checkbox toggles), not when a handler
+    # replaces the table, which already resets the selection display itself.
+    file_list_df.input(
         fn=handle_selection_change,
-        inputs=[file_list_df, path_input],
-        outputs=[selected_paths_state, selected_display]
+        inputs=[file_list_df],
+        outputs=[selected_display]
     )
     
     file_list_df.select(
         fn=handle_row_select,
         # ADDED confirm_delete_checkbox to inputs
-        inputs=[file_list_df, path_input, selected_display, selected_paths_state, confirm_delete_checkbox],
+        inputs=[file_list_df, path_input, selected_display, confirm_delete_checkbox],
         # ADDED confirm_delete_checkbox to outputs
-        outputs=[path_input, file_list_df, selected_display, selected_paths_state, confirm_delete_checkbox]
+        outputs=[path_input, file_list_df, selected_display, confirm_delete_checkbox, rendered_listing_state]
     )
 
     download_button.click(
@@ -361,7 +651,7 @@ with gr.Blocks() as demo:
     delete_button.click(
         fn=delete_selected_items,
         inputs=[file_list_df, confirm_delete_checkbox, path_input],
-        outputs=[path_input, file_list_df, selected_display, selected_paths_state, confirm_delete_checkbox]
+        outputs=[path_input, file_list_df, selected_display, confirm_delete_checkbox, rendered_listing_state]
     )
     
     upload_btn.click(
@@ -371,8 +661,8 @@ with gr.Blocks() as demo:
             path_input, 
             file_list_df, 
             selected_display, 
-            selected_paths_state, 
             confirm_delete_checkbox, 
+            rendered_listing_state,
             file_uploader # This is the extra output to clear the box
         ]
     )